@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+NSE Annual Reports Work Queue
+This module coordinates several scraper processes through a SQLite job queue.
+Workers lease company and download jobs, keep them alive with heartbeats and
+acknowledge them when finished; jobs from crashed workers return to the queue.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from report_index import load_company_metadata
+from scrape_annual_reports import NSEReportsScraper
+
+QUEUE_FILENAME = "work_queue.db"
+
+HOUR = 3600
+
+# Downloads are leased before companies so discovered files are fetched promptly
+JOB_PRIORITY = {'download': 0, 'company': 1}
+
+
+class LeaseCoordinator:
+    def __init__(self, db_path, lease_seconds=300, max_attempts=5, retry_delay=30, max_retry_delay=HOUR):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        # A released job waits retry_delay seconds, doubling with each attempt, before it can be leased again
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # Autocommit mode, so leases can take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_schema()
+
+    def create_schema(self):
+        """Create the jobs table if missing"""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                done_at REAL,
+                not_before REAL,
+                UNIQUE (kind, key)
+            )
+        """)
+        # Queues created before retry backoff lack the column
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if 'not_before' not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, priority, id)")
+
+    def enqueue(self, kind, key, payload):
+        """Add a job unless one with the same kind and key already exists"""
+        cursor = self.conn.execute("""
+            INSERT OR IGNORE INTO jobs (kind, key, payload, priority, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (kind, key, json.dumps(payload), JOB_PRIORITY.get(kind, 1), time.time()))
+        return cursor.rowcount == 1
+
+    def enqueue_companies(self, csv_file_path, max_companies=None, start_from=0, requeue=False):
+        """Add one company job per CSV row
+
+        With requeue, finished company jobs and failed download jobs go back to
+        pending so a drained queue can run another sweep. Finished downloads stay
+        done; their files are already on disk.
+        """
+        companies = list(load_company_metadata(csv_file_path).items())[start_from:]
+        if max_companies:
+            companies = companies[:max_companies]
+
+        added = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for symbol, metadata in companies:
+                if not metadata['company_name']:
+                    continue
+                if self.enqueue('company', symbol, dict(metadata, symbol=symbol)):
+                    added += 1
+                elif requeue:
+                    added += self.requeue('company', symbol)
+            if requeue:
+                self.conn.execute("""
+                    UPDATE jobs SET state = 'pending', attempts = 0, last_error = NULL, not_before = NULL
+                    WHERE kind = 'download' AND state = 'failed'
+                """)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def requeue(self, kind, key):
+        """Put a finished or failed job back to pending with a fresh attempt count"""
+        cursor = self.conn.execute("""
+            UPDATE jobs
+            SET state = 'pending', attempts = 0, last_error = NULL, done_at = NULL, not_before = NULL
+            WHERE kind = ? AND key = ? AND state IN ('done', 'failed')
+        """, (kind, key))
+        return cursor.rowcount == 1
+
+    def reclaim_expired(self, now):
+        """Return jobs whose lease ran out to the queue, or fail them after too many attempts"""
+        self.conn.execute("""
+            UPDATE jobs
+            SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                worker_id = NULL, lease_expires = NULL,
+                last_error = 'lease expired'
+            WHERE state = 'leased' AND lease_expires < ?
+        """, (self.max_attempts, now))
+
+    def lease(self, worker_id):
+        """Lease the next pending job to a worker, or return None if there is none"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.reclaim_expired(now)
+            row = self.conn.execute("""
+                SELECT * FROM jobs
+                WHERE state = 'pending' AND (not_before IS NULL OR not_before <= ?)
+                ORDER BY priority, id LIMIT 1
+            """, (now,)).fetchone()
+
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            self.conn.execute("""
+                UPDATE jobs
+                SET state = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE id = ?
+            """, (worker_id, now + self.lease_seconds, row['id']))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        job = dict(row)
+        job.update(state='leased', worker_id=worker_id, lease_expires=now + self.lease_seconds,
+                   attempts=row['attempts'] + 1)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def heartbeat(self, job_id, worker_id):
+        """Extend a lease; returns False if the worker no longer holds it"""
+        cursor = self.conn.execute("""
+            UPDATE jobs SET lease_expires = ?
+            WHERE id = ? AND state = 'leased' AND worker_id = ?
+        """, (time.time() + self.lease_seconds, job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def ack(self, job_id, worker_id):
+        """Mark a job done; only the current lease holder can do this, and only once"""
+        cursor = self.conn.execute("""
+            UPDATE jobs SET state = 'done', done_at = ?, lease_expires = NULL
+            WHERE id = ? AND state = 'leased' AND worker_id = ?
+        """, (time.time(), job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def release(self, job_id, worker_id, error=None):
+        """Give a job back after a failure to retry later, failing it for good after too many attempts"""
+        cursor = self.conn.execute("""
+            UPDATE jobs
+            SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                worker_id = NULL, lease_expires = NULL, last_error = ?,
+                not_before = ? + MIN(? * (1 << MAX(attempts - 1, 0)), ?)
+            WHERE id = ? AND state = 'leased' AND worker_id = ?
+        """, (self.max_attempts, error, time.time(), self.retry_delay, self.max_retry_delay,
+              job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def lease_holders(self):
+        """Worker ids that currently hold at least one unexpired lease"""
+        rows = self.conn.execute("""
+            SELECT DISTINCT worker_id FROM jobs WHERE state = 'leased' AND lease_expires >= ?
+        """, (time.time(),))
+        return {row['worker_id'] for row in rows}
+
+    def counts(self):
+        """Number of jobs per kind and state"""
+        counts = {}
+        for row in self.conn.execute("SELECT kind, state, COUNT(*) AS n FROM jobs GROUP BY kind, state"):
+            counts.setdefault(row['kind'], {})[row['state']] = row['n']
+        return counts
+
+    def has_open_jobs(self):
+        """Check whether any job is still pending or leased"""
+        row = self.conn.execute("SELECT 1 FROM jobs WHERE state IN ('pending', 'leased') LIMIT 1").fetchone()
+        return row is not None
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+
+class Heartbeat:
+    """Keeps a job's lease alive from a background thread while the job runs"""
+
+    def __init__(self, db_path, job_id, worker_id, lease_seconds):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = lease_seconds / 3
+        self.stop_event = threading.Event()
+        self.lost = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        # SQLite connections cannot be shared between threads, so open a separate one
+        coordinator = LeaseCoordinator(self.db_path, lease_seconds=self.lease_seconds)
+        try:
+            while not self.stop_event.wait(self.interval):
+                if not coordinator.heartbeat(self.job_id, self.worker_id):
+                    self.lost = True
+                    break
+        finally:
+            coordinator.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop_event.set()
+        self.thread.join()
+
+
+class LeaseWorker:
+    def __init__(self, db_path, scraper=None, lease_seconds=300, idle_wait=10, request_delay=2, retry_delay=30):
+        self.scraper = scraper or NSEReportsScraper()
+        self.db_path = db_path
+        self.coordinator = LeaseCoordinator(db_path, lease_seconds=lease_seconds, retry_delay=retry_delay)
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.idle_wait = idle_wait
+        self.request_delay = request_delay
+
+    def run_company_job(self, job):
+        """Search one company and queue a download job for each report link"""
+        payload = job['payload']
+        data = self.scraper.search_company_reports(payload['company_name'], payload['symbol'])
+
+        if data is None:
+            # Usually an expired session; refresh cookies before the job is retried
+            self.scraper.get_initial_cookies()
+            return False, "API request failed"
+
+        if not data:
+            print(f"No data found for {payload['company_name']}")
+            return True, None
+
+        # Download jobs carry the company metadata so the report index gets ISIN and industry
+        links = self.scraper.extract_download_links_from_response(data)
+        for link in links:
+            self.coordinator.enqueue('download', link, dict(payload, url=link))
+
+        print(f"Queued {len(links)} files for {payload['company_name']}")
+        return True, None
+
+    def remove_stale_parts(self, payload):
+        """Delete partial files of this report left by workers that no longer hold any lease"""
+        filename = os.path.basename(urlparse(payload['url']).path)
+        company_dir = self.scraper.downloads_dir / self.scraper.sanitize_filename(payload['company_name'])
+        if not company_dir.exists():
+            return
+
+        holders = self.coordinator.lease_holders()
+        for part_path in company_dir.glob(f"{filename}.*.part"):
+            owner = part_path.name[len(filename) + 1:-len(".part")]
+            if owner not in holders:
+                print(f"Removing stale partial file: {part_path}")
+                part_path.unlink()
+
+    def run_download_job(self, job):
+        """Download one report file"""
+        payload = job['payload']
+        symbol = payload['symbol']
+        self.scraper.company_metadata[symbol] = {
+            'company_name': payload['company_name'],
+            'isin': payload.get('isin'),
+            'industry': payload.get('industry'),
+        }
+
+        self.remove_stale_parts(payload)
+
+        # A worker-specific partial file, moved into place only while this worker still holds the lease
+        if self.scraper.download_file(payload['url'], payload['company_name'], symbol=symbol,
+                                      part_suffix=f".{self.worker_id}.part",
+                                      confirm=lambda: self.coordinator.heartbeat(job['id'], self.worker_id)):
+            return True, None
+
+        if not self.coordinator.heartbeat(job['id'], self.worker_id):
+            return False, "lease lost"
+
+        # Usually an expired session; refresh cookies before the job is retried
+        self.scraper.get_initial_cookies()
+        return False, "download failed"
+
+    def run(self):
+        """Lease and run jobs until the queue has nothing left open"""
+        print(f"NSE Annual Reports Worker {self.worker_id} Starting...")
+
+        if not self.scraper.get_initial_cookies():
+            print("Failed to get initial cookies. Continuing anyway...")
+
+        done = 0
+        failed = 0
+
+        try:
+            while True:
+                job = self.coordinator.lease(self.worker_id)
+
+                if job is None:
+                    if not self.coordinator.has_open_jobs():
+                        break
+                    # Other workers still hold leases; their jobs may yet return or add downloads
+                    time.sleep(self.idle_wait)
+                    continue
+
+                print(f"\nLeased {job['kind']} job {job['id']}: {job['key']}")
+
+                try:
+                    with Heartbeat(self.db_path, job['id'], self.worker_id, self.lease_seconds) as heartbeat:
+                        if job['kind'] == 'company':
+                            success, error = self.run_company_job(job)
+                        else:
+                            success, error = self.run_download_job(job)
+                except Exception as e:
+                    success, error = False, str(e)
+
+                if heartbeat.lost:
+                    print(f"Lease on job {job['id']} was lost; leaving it to its new holder")
+                elif success:
+                    if self.coordinator.ack(job['id'], self.worker_id):
+                        done += 1
+                    else:
+                        print(f"Job {job['id']} was already acknowledged or re-leased")
+                elif self.coordinator.release(job['id'], self.worker_id, error):
+                    print(f"Job {job['id']} failed: {error}")
+                    failed += 1
+                else:
+                    print(f"Lease on job {job['id']} was lost; leaving it to its new holder")
+
+                time.sleep(self.request_delay)  # Be respectful to the server
+
+        except KeyboardInterrupt:
+            print("\nWorker interrupted by user")
+
+        print(f"\n{'='*50}")
+        print("WORKER FINISHED")
+        print(f"{'='*50}")
+        print(f"Jobs completed: {done}")
+        print(f"Jobs failed: {failed}")
+
+
+def main():
+    """Command line interface for filling the queue, running workers and checking progress"""
+    parser = argparse.ArgumentParser(description="Coordinate several NSE scraper workers through a shared job queue")
+    parser.add_argument('--db', default=str(Path("downloaded_reports") / QUEUE_FILENAME),
+                        help="Path to the queue database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help="Add a company job for every company in the CSV")
+    enqueue_parser.add_argument('--csv', default="ind_nifty500list.csv", help="Company list CSV file")
+    enqueue_parser.add_argument('--max-companies', type=int, help="Only queue this many companies")
+    enqueue_parser.add_argument('--start-from', type=int, default=0, help="Skip companies before this index")
+    enqueue_parser.add_argument('--requeue', action='store_true',
+                                help="Re-arm finished company jobs and failed downloads for another sweep")
+
+    worker_parser = subparsers.add_parser('worker', help="Lease and run jobs until the queue is empty")
+    worker_parser.add_argument('--lease-seconds', type=int, default=300, help="Lease length before a job is reclaimed")
+    worker_parser.add_argument('--retry-delay', type=int, default=30,
+                               help="Seconds before a failed job is retried, doubling with each attempt")
+
+    subparsers.add_parser('status', help="Show job counts by kind and state")
+
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        coordinator = LeaseCoordinator(args.db)
+        added = coordinator.enqueue_companies(args.csv, max_companies=args.max_companies,
+                                              start_from=args.start_from, requeue=args.requeue)
+        print(f"Queued {added} company jobs")
+        coordinator.close()
+    elif args.command == 'worker':
+        worker = LeaseWorker(args.db, lease_seconds=args.lease_seconds, retry_delay=args.retry_delay)
+        worker.run()
+    else:
+        coordinator = LeaseCoordinator(args.db)
+        for kind, states in sorted(coordinator.counts().items()):
+            summary = ", ".join(f"{state}: {n}" for state, n in sorted(states.items()))
+            print(f"{kind}: {summary}")
+        coordinator.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
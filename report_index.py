@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+NSE Annual Reports Index
+This module keeps a SQLite index of every downloaded report so the corpus can be
+queried without walking the downloaded_reports folder.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+INDEX_FILENAME = "reports_index.db"
+
+REPORT_COLUMNS = [
+    'symbol', 'company_name', 'isin', 'industry', 'fiscal_year',
+    'filename', 'path', 'url', 'size', 'sha256', 'downloaded_at'
+]
+
+
+def load_company_metadata(csv_file_path):
+    """Load symbol -> company metadata (name, ISIN, industry) from the CSV file"""
+    metadata = {}
+
+    try:
+        with open(csv_file_path, 'r', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                symbol = row.get('Symbol', '').strip()
+                if not symbol:
+                    continue
+                metadata[symbol] = {
+                    'company_name': row.get('Company Name', '').strip(),
+                    'isin': row.get('ISIN Code', '').strip(),
+                    'industry': row.get('Industry', '').strip(),
+                }
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        return {}
+
+    return metadata
+
+
+def guess_fiscal_year(url_or_filename):
+    """Guess the fiscal year from a report URL or file name.
+
+    NSE names reports like AR_24562_RELIANCE_2022_2023_A_07082023214508.pdf,
+    so the latest standalone year is taken (FY2023 is the year ending March 2023).
+    Long digit runs such as upload timestamps are ignored.
+    """
+    name = os.path.basename(unquote(urlparse(url_or_filename).path))
+    years = [int(y) for y in re.findall(r'(?<!\d)((?:19|20)\d{2})(?!\d)', name)]
+    return max(years) if years else None
+
+
+def file_sha256(file_path, chunk_size=65536):
+    """Compute the SHA-256 digest of a file on disk"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReportIndex:
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_schema()
+
+    def create_schema(self):
+        """Create the reports table and its lookup indexes if missing"""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    path TEXT PRIMARY KEY,
+                    symbol TEXT NOT NULL,
+                    company_name TEXT,
+                    isin TEXT,
+                    industry TEXT COLLATE NOCASE,
+                    fiscal_year INTEGER,
+                    filename TEXT NOT NULL,
+                    url TEXT,
+                    size INTEGER,
+                    sha256 TEXT,
+                    downloaded_at REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_symbol ON reports(symbol)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_industry_fy ON reports(industry, fiscal_year)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_fy ON reports(fiscal_year)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_url ON reports(url)")
+
+    def normalize_path(self, path):
+        """Key a file by its path relative to the index folder, so the working directory does not matter"""
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(self.db_path.parent.resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def record_report(self, path, symbol, url, size, sha256, company_name=None,
+                      isin=None, industry=None, fiscal_year=None, downloaded_at=None):
+        """Insert or replace one completed report in a single transaction"""
+        path = Path(path)
+        if fiscal_year is None:
+            fiscal_year = guess_fiscal_year(url or path.name)
+        if downloaded_at is None:
+            downloaded_at = time.time()
+
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO reports
+                    (path, symbol, company_name, isin, industry, fiscal_year,
+                     filename, url, size, sha256, downloaded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (self.normalize_path(path), symbol, company_name, isin, industry, fiscal_year,
+                  path.name, url, size, sha256, downloaded_at))
+
+    def has_path(self, path):
+        """Check whether a file path is already indexed"""
+        row = self.conn.execute("SELECT 1 FROM reports WHERE path = ?", (self.normalize_path(path),)).fetchone()
+        return row is not None
+
+    def has_url(self, url):
+        """Check whether a report URL is already indexed"""
+        row = self.conn.execute("SELECT 1 FROM reports WHERE url = ?", (url,)).fetchone()
+        return row is not None
+
+    def query(self, symbol=None, isin=None, industry=None, fiscal_year=None):
+        """Return indexed reports matching all of the given filters"""
+        clauses = []
+        params = []
+
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        if isin:
+            clauses.append("isin = ?")
+            params.append(isin)
+        if industry:
+            clauses.append("industry = ?")
+            params.append(industry)
+        if fiscal_year:
+            clauses.append("fiscal_year = ?")
+            params.append(int(fiscal_year))
+
+        sql = f"SELECT {', '.join(REPORT_COLUMNS)} FROM reports"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY symbol, fiscal_year, filename"
+
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def export_csv(self, output_path, rows=None):
+        """Write indexed reports to a CSV file"""
+        if rows is None:
+            rows = self.query()
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return len(rows)
+
+    def export_jsonl(self, output_path, rows=None):
+        """Write indexed reports to a JSON Lines file"""
+        if rows is None:
+            rows = self.query()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        return len(rows)
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+
+def main():
+    """Command line interface for querying and exporting the index"""
+    parser = argparse.ArgumentParser(description="Query the index of downloaded NSE annual reports")
+    parser.add_argument('--db', default=str(Path("downloaded_reports") / INDEX_FILENAME),
+                        help="Path to the index database")
+    parser.add_argument('--symbol', help="Filter by NSE symbol")
+    parser.add_argument('--isin', help="Filter by ISIN code")
+    parser.add_argument('--industry', help="Filter by industry (case-insensitive)")
+    parser.add_argument('--fy', type=int, help="Filter by fiscal year, e.g. 2023")
+    parser.add_argument('--export', choices=['csv', 'jsonl'], help="Export matching rows instead of printing")
+    parser.add_argument('--output', help="Output file for --export (defaults to reports_index.<format>)")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"Index not found: {args.db}")
+        return 1
+
+    index = ReportIndex(args.db)
+    try:
+        rows = index.query(symbol=args.symbol, isin=args.isin,
+                           industry=args.industry, fiscal_year=args.fy)
+
+        if args.export:
+            output_path = args.output or f"reports_index.{args.export}"
+            if args.export == 'csv':
+                count = index.export_csv(output_path, rows)
+            else:
+                count = index.export_jsonl(output_path, rows)
+            print(f"Exported {count} reports to {output_path}")
+            return 0
+
+        for row in rows:
+            print(f"{row['symbol']:<12} FY{row['fiscal_year'] or '----'}  "
+                  f"{row['industry'] or '':<32} {row['size'] or 0:>12}  {row['path']}")
+        print(f"{len(rows)} reports")
+    finally:
+        index.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,7 @@ This script scrapes annual reports from NSE India website for companies listed i
 """
 
 import csv
+import hashlib
 import json
 import os
 import re
@@ -13,6 +14,8 @@ import time
 from urllib.parse import urljoin, urlparse
 from pathlib import Path
 
+from report_index import INDEX_FILENAME, ReportIndex, file_sha256, load_company_metadata
+
 class NSEReportsScraper:
     def __init__(self):
         self.base_url = "https://www.nseindia.com"
@@ -40,6 +43,10 @@ class NSEReportsScraper:
         self.downloads_dir = Path("downloaded_reports")
         self.downloads_dir.mkdir(exist_ok=True)
         
+        # Index of completed downloads, plus symbol -> ISIN/industry from the CSV
+        self.index = ReportIndex(self.downloads_dir / INDEX_FILENAME)
+        self.company_metadata = {}
+        
     def get_initial_cookies(self):
         """Get initial cookies by visiting the main page"""
         try:
@@ -97,8 +104,12 @@ class NSEReportsScraper:
             print(f"Error searching reports for {company_name}: {e}")
             return None
     
-    def download_file(self, url, company_name, filename=None):
-        """Download a file from the given URL"""
+    def download_file(self, url, company_name, filename=None, symbol=None, part_suffix='.part', confirm=None):
+        """Download a file from the given URL
+
+        confirm, if given, is called once the data is written; returning False
+        discards the partial file instead of moving it into place.
+        """
         try:
             if not filename:
                 filename = os.path.basename(urlparse(url).path)
@@ -109,9 +120,14 @@ class NSEReportsScraper:
             
             file_path = company_dir / filename
             
-            # Skip if file already exists
+            # Skip if file already exists, indexing it if an earlier run did not
             if file_path.exists():
                 print(f"File already exists: {file_path}")
+                if symbol and not self.index.has_path(file_path):
+                    # Use the file's modification time, not the time it was first seen
+                    self.index_report(file_path, url, company_name, symbol,
+                                      file_path.stat().st_size, file_sha256(file_path),
+                                      downloaded_at=file_path.stat().st_mtime)
                 return True
             
             print(f"Downloading: {filename}")
@@ -119,10 +135,29 @@ class NSEReportsScraper:
             response = self.session.get(url, stream=True)
             
             if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+                # Write to a partial file so an interrupted download is never mistaken for a complete one
+                part_path = file_path.with_name(file_path.name + part_suffix)
+                digest = hashlib.sha256()
+                size = 0
+                try:
+                    with open(part_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=8192):
+                            if chunk:
+                                f.write(chunk)
+                                digest.update(chunk)
+                                size += len(chunk)
+                    if confirm is not None and not confirm():
+                        print(f"Discarding download of {url}: no longer confirmed")
+                        part_path.unlink()
+                        return False
+                    part_path.replace(file_path)
+                except Exception:
+                    if part_path.exists():
+                        part_path.unlink()  # Remove partial file
+                    raise
+                
+                if symbol:
+                    self.index_report(file_path, url, company_name, symbol, size, digest.hexdigest())
                 
                 print(f"Downloaded: {file_path}")
                 return True
@@ -134,6 +169,17 @@ class NSEReportsScraper:
             print(f"Error downloading file {url}: {e}")
             return False
     
+    def index_report(self, file_path, url, company_name, symbol, size, sha256, downloaded_at=None):
+        """Record a completed download in the report index"""
+        metadata = self.company_metadata.get(symbol, {})
+        self.index.record_report(
+            file_path, symbol, url, size, sha256,
+            company_name=metadata.get('company_name', company_name),
+            isin=metadata.get('isin'),
+            industry=metadata.get('industry'),
+            downloaded_at=downloaded_at,
+        )
+    
     def sanitize_filename(self, filename):
         """Sanitize filename for Windows compatibility"""
         # Remove or replace invalid characters
@@ -193,7 +239,7 @@ class NSEReportsScraper:
         # Download each file
         downloaded_count = 0
         for link in download_links:
-            if self.download_file(link, company_name):
+            if self.download_file(link, company_name, symbol=symbol):
                 downloaded_count += 1
             
             # Add a small delay between downloads
@@ -232,6 +278,7 @@ class NSEReportsScraper:
         
         # Load companies from CSV
         companies = self.load_companies_from_csv(csv_file_path)
+        self.company_metadata = load_company_metadata(csv_file_path)
         
         if not companies:
             print("No companies loaded from CSV file")
@@ -278,6 +325,7 @@ class NSEReportsScraper:
         print(f"Companies with downloads: {successful_companies}")
         print(f"Total files downloaded: {total_downloads}")
         print(f"Downloads saved in: {self.downloads_dir.absolute()}")
+        print(f"Report index: {self.index.db_path.absolute()}")
 
 def main():
     """Main function"""
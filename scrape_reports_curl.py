@@ -13,6 +13,8 @@ import time
 from pathlib import Path
 from urllib.parse import quote, unquote
 
+from report_index import INDEX_FILENAME, ReportIndex, file_sha256, load_company_metadata
+
 class CurlBasedNSEScraper:
     def __init__(self):
         self.base_url = "https://www.nseindia.com"
@@ -22,6 +24,10 @@ class CurlBasedNSEScraper:
         self.downloads_dir = Path("downloaded_reports")
         self.downloads_dir.mkdir(exist_ok=True)
         
+        # Index of completed downloads, plus symbol -> ISIN/industry from the CSV
+        self.index = ReportIndex(self.downloads_dir / INDEX_FILENAME)
+        self.company_metadata = {}
+        
         # Create a temporary directory for curl outputs
         self.temp_dir = Path("temp_curl_outputs")
         self.temp_dir.mkdir(exist_ok=True)
@@ -125,7 +131,7 @@ class CurlBasedNSEScraper:
             print(f"Error searching reports for {company_name}: {e}")
             return None
     
-    def download_file_curl(self, url, company_name, filename=None):
+    def download_file_curl(self, url, company_name, filename=None, symbol=None):
         """Download a file using curl"""
         try:
             if not filename:
@@ -137,19 +143,26 @@ class CurlBasedNSEScraper:
             
             file_path = company_dir / filename
             
-            # Skip if file already exists
+            # Skip if file already exists, indexing it if an earlier run did not
             if file_path.exists():
                 print(f"File already exists: {file_path}")
+                if symbol and not self.index.has_path(file_path):
+                    # Use the file's modification time, not the time it was first seen
+                    self.index_report(file_path, url, company_name, symbol,
+                                      downloaded_at=file_path.stat().st_mtime)
                 return True
             
             print(f"Downloading: {filename}")
             
+            # Download to a partial file so an interrupted download is never mistaken for a complete one
+            part_path = file_path.with_name(file_path.name + '.part')
+            
             cmd = [
                 'curl',
                 '-s',
                 '-L',  # Follow redirects
                 '-b', str(self.cookies_file),  # Use cookies
-                '-o', str(file_path),  # Output file
+                '-o', str(part_path),  # Output file
                 url
             ]
             
@@ -164,19 +177,33 @@ class CurlBasedNSEScraper:
             
             result = subprocess.run(cmd, capture_output=True, text=True)
             
-            if result.returncode == 0 and file_path.exists() and file_path.stat().st_size > 0:
+            if result.returncode == 0 and part_path.exists() and part_path.stat().st_size > 0:
+                part_path.replace(file_path)
+                if symbol:
+                    self.index_report(file_path, url, company_name, symbol)
                 print(f"Downloaded: {file_path} ({file_path.stat().st_size} bytes)")
                 return True
             else:
                 print(f"Failed to download {url}")
-                if file_path.exists():
-                    file_path.unlink()  # Remove empty file
+                if part_path.exists():
+                    part_path.unlink()  # Remove empty or partial file
                 return False
                 
         except Exception as e:
             print(f"Error downloading file {url}: {e}")
             return False
     
+    def index_report(self, file_path, url, company_name, symbol, downloaded_at=None):
+        """Record a completed download in the report index"""
+        metadata = self.company_metadata.get(symbol, {})
+        self.index.record_report(
+            file_path, symbol, url, file_path.stat().st_size, file_sha256(file_path),
+            company_name=metadata.get('company_name', company_name),
+            isin=metadata.get('isin'),
+            industry=metadata.get('industry'),
+            downloaded_at=downloaded_at,
+        )
+    
     def sanitize_filename(self, filename):
         """Sanitize filename for Windows compatibility"""
         invalid_chars = '<>:"/\\|?*'
@@ -232,7 +259,7 @@ class CurlBasedNSEScraper:
         # Download each file
         downloaded_count = 0
         for link in download_links:
-            if self.download_file_curl(link, company_name):
+            if self.download_file_curl(link, company_name, symbol=symbol):
                 downloaded_count += 1
             
             # Add a small delay between downloads
@@ -271,6 +298,7 @@ class CurlBasedNSEScraper:
         
         # Load companies from CSV
         companies = self.load_companies_from_csv(csv_file_path)
+        self.company_metadata = load_company_metadata(csv_file_path)
         
         if not companies:
             print("No companies loaded from CSV file")
@@ -317,6 +345,7 @@ class CurlBasedNSEScraper:
         print(f"Companies with downloads: {successful_companies}")
         print(f"Total files downloaded: {total_downloads}")
         print(f"Downloads saved in: {self.downloads_dir.absolute()}")
+        print(f"Report index: {self.index.db_path.absolute()}")
         
         # Clean up temporary files
         self.cleanup()
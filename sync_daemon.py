@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+NSE Annual Reports Sync Daemon
+This script keeps one warm session open and re-polls each company's annual reports
+on an adaptive schedule instead of repeating the full sweep from cron.
+"""
+
+import hashlib
+import heapq
+import random
+import time
+from datetime import datetime
+
+from report_index import load_company_metadata
+from scrape_annual_reports import NSEReportsScraper
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Most companies close their books in March and publish the annual report ahead of
+# the AGM, so July to September is the default filing window
+DEFAULT_FILING_MONTHS = {7, 8, 9}
+
+
+class SyncDaemon:
+    def __init__(self, scraper=None, min_interval=6 * HOUR, window_interval=DAY,
+                 base_interval=7 * DAY, max_interval=30 * DAY,
+                 cookie_refresh_interval=HOUR, request_delay=2):
+        self.scraper = scraper or NSEReportsScraper()
+
+        # Poll intervals, in seconds
+        self.min_interval = min_interval          # right after a change, or retrying after a failure
+        self.window_interval = window_interval    # inside a company's filing window
+        self.base_interval = base_interval        # first quiet poll outside the window
+        self.max_interval = max_interval          # ceiling for dormant companies
+
+        self.cookie_refresh_interval = cookie_refresh_interval
+        self.request_delay = request_delay
+        self.last_cookie_refresh = 0
+
+        # Schedule state lives next to the report index
+        self.conn = self.scraper.index.conn
+        self.create_schema()
+
+    def create_schema(self):
+        """Create the poll state table if missing"""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS poll_state (
+                    symbol TEXT PRIMARY KEY,
+                    company_name TEXT NOT NULL,
+                    next_poll REAL NOT NULL,
+                    interval REAL,
+                    last_polled REAL,
+                    last_changed REAL,
+                    links_digest TEXT,
+                    filing_months TEXT DEFAULT '',
+                    failures INTEGER DEFAULT 0,
+                    retries INTEGER DEFAULT 0
+                )
+            """)
+            # Tables created before download retries were tracked lack the column
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(poll_state)")}
+            if 'retries' not in columns:
+                self.conn.execute("ALTER TABLE poll_state ADD COLUMN retries INTEGER DEFAULT 0")
+
+    def add_companies(self, companies):
+        """Register companies; ones already scheduled keep their state"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR IGNORE INTO poll_state (symbol, company_name, next_poll)
+                VALUES (?, ?, ?)
+            """, [(symbol, company_name, now) for company_name, symbol in companies])
+
+    def load_schedule(self, companies):
+        """Build a heap of (next_poll, symbol) for the given companies from the stored state"""
+        symbols = {symbol for company_name, symbol in companies}
+        schedule = [(row['next_poll'], row['symbol'])
+                    for row in self.conn.execute("SELECT symbol, next_poll FROM poll_state")
+                    if row['symbol'] in symbols]
+        heapq.heapify(schedule)
+        return schedule
+
+    def refresh_cookies(self, force=False):
+        """Re-visit the listing page when the session cookies are getting old"""
+        if force or time.time() - self.last_cookie_refresh >= self.cookie_refresh_interval:
+            if not self.scraper.get_initial_cookies():
+                print("Failed to refresh cookies. Continuing anyway...")
+            self.last_cookie_refresh = time.time()
+
+    def filing_months(self, state):
+        """Months in which this company has published before, or the default window"""
+        months = {int(m) for m in (state['filing_months'] or '').split(',') if m}
+        return months or DEFAULT_FILING_MONTHS
+
+    def next_window_start(self, state, now):
+        """Timestamp of the first day of the next filing month after the current one"""
+        months = self.filing_months(state)
+        current = datetime.fromtimestamp(now)
+        for offset in range(1, 13):
+            month_index = current.month - 1 + offset
+            year, month = current.year + month_index // 12, month_index % 12 + 1
+            if month in months:
+                return datetime(year, month, 1).timestamp()
+        return None
+
+    def next_interval(self, state, changed, failed, now):
+        """Pick how long to wait before polling a company again"""
+        if failed:
+            interval = min(self.min_interval * 2 ** state['failures'], self.max_interval)
+        elif changed:
+            interval = self.min_interval
+        elif datetime.fromtimestamp(now).month in self.filing_months(state):
+            interval = self.window_interval
+        elif state['interval'] and state['interval'] >= self.base_interval:
+            interval = min(state['interval'] * 2, self.max_interval)
+        else:
+            interval = self.base_interval
+        return interval
+
+    def retry_interval(self, retries):
+        """Back off retries of report links that failed to download"""
+        return min(self.min_interval * 2 ** retries, self.max_interval)
+
+    def next_poll_time(self, state, interval, now):
+        """Turn an interval into a poll time, never sleeping past the opening of a filing window"""
+        # Spread polls out so companies added together do not stay in lockstep
+        next_poll = now + interval * random.uniform(0.9, 1.1)
+
+        window_start = self.next_window_start(state, now)
+        if window_start is not None:
+            next_poll = min(next_poll, window_start)
+        return next_poll
+
+    def poll_company(self, symbol):
+        """Poll one company, download any new reports and reschedule it"""
+        state = self.conn.execute("SELECT * FROM poll_state WHERE symbol = ?", (symbol,)).fetchone()
+        company_name = state['company_name']
+        now = time.time()
+
+        data = self.scraper.search_company_reports(company_name, symbol)
+        failed = data is None
+        downloaded = 0
+        missing = []
+        retries = state['retries'] or 0
+        links_digest = state['links_digest']
+
+        if failed:
+            # Usually an expired session; get fresh cookies before the next request
+            self.refresh_cookies(force=True)
+        else:
+            links = self.scraper.extract_download_links_from_response(data)
+
+            # An empty answer after links were seen says nothing new, so it must not count as a change
+            if links or links_digest is None:
+                links_digest = hashlib.sha256("\n".join(sorted(links)).encode('utf-8')).hexdigest()
+            else:
+                print(f"{symbol}: no report links returned; keeping previous state")
+
+            for link in links:
+                if self.scraper.index.has_url(link):
+                    continue
+                if self.scraper.download_file(link, company_name, symbol=symbol):
+                    downloaded += 1
+                time.sleep(1)
+
+            missing = [link for link in links if not self.scraper.index.has_url(link)]
+            retries = retries + 1 if missing else 0
+
+        # The first poll of a company only establishes a baseline
+        changed = state['links_digest'] is not None and links_digest != state['links_digest']
+
+        filing_months = state['filing_months'] or ''
+        if changed:
+            months = {m for m in filing_months.split(',') if m}
+            months.add(str(datetime.fromtimestamp(now).month))
+            filing_months = ','.join(sorted(months, key=int))
+
+        failures = state['failures'] + 1 if failed else 0
+        interval = self.next_interval(state, changed, failed, now)
+
+        # Links that failed to download are retried sooner, backing off so a dead link
+        # does not keep the company on the shortest interval
+        poll_interval = interval
+        if missing:
+            poll_interval = min(interval, self.retry_interval(retries - 1))
+        next_poll = self.next_poll_time(state, poll_interval, now)
+
+        with self.conn:
+            self.conn.execute("""
+                UPDATE poll_state
+                SET next_poll = ?, interval = ?, last_polled = ?, last_changed = ?,
+                    links_digest = ?, filing_months = ?, failures = ?, retries = ?
+                WHERE symbol = ?
+            """, (next_poll, state['interval'] if failed else interval, now, now if changed else state['last_changed'],
+                  links_digest, filing_months, failures, retries, symbol))
+
+        status = "failed" if failed else ("changed" if changed else "unchanged")
+        if missing:
+            status += f", {len(missing)} downloads to retry"
+        print(f"{symbol}: {status}, {downloaded} new files, next poll in {(next_poll - now) / HOUR:.1f}h")
+        return next_poll, downloaded
+
+    def run(self, csv_file_path):
+        """Poll companies forever, always taking the one that is due soonest"""
+        print("NSE Annual Reports Sync Daemon Starting...")
+
+        companies = self.scraper.load_companies_from_csv(csv_file_path)
+        self.scraper.company_metadata = load_company_metadata(csv_file_path)
+
+        if not companies:
+            print("No companies loaded from CSV file")
+            return
+
+        self.add_companies(companies)
+        schedule = self.load_schedule(companies)
+        print(f"Scheduled {len(schedule)} companies")
+
+        total_downloads = 0
+        polls = 0
+
+        try:
+            while schedule:
+                next_poll, symbol = heapq.heappop(schedule)
+
+                wait = next_poll - time.time()
+                if wait > 0:
+                    print(f"Next poll ({symbol}) in {wait / 60:.1f} minutes")
+                    time.sleep(wait)
+
+                self.refresh_cookies()
+
+                try:
+                    next_poll, downloads = self.poll_company(symbol)
+                    total_downloads += downloads
+                    polls += 1
+                except Exception as e:
+                    print(f"Error polling {symbol}: {e}")
+                    next_poll = time.time() + self.min_interval
+
+                heapq.heappush(schedule, (next_poll, symbol))
+                time.sleep(self.request_delay)  # Be respectful to the server
+
+        except KeyboardInterrupt:
+            print("\nSync daemon stopped by user")
+
+        print(f"\n{'='*50}")
+        print("SYNC DAEMON STOPPED")
+        print(f"{'='*50}")
+        print(f"Polls made: {polls}")
+        print(f"Total files downloaded: {total_downloads}")
+
+
+def main():
+    """Main function"""
+    # Configuration
+    CSV_FILE = "ind_nifty500list.csv"
+
+    # Create and run the daemon
+    daemon = SyncDaemon()
+    daemon.run(CSV_FILE)
+
+
+if __name__ == "__main__":
+    main()
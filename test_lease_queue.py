@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the lease queue coordinator and worker
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from lease_queue import Heartbeat, LeaseCoordinator, LeaseWorker
+from scrape_annual_reports import NSEReportsScraper
+
+CSV_ROWS = """Company Name,Industry,Symbol,Series,ISIN Code
+360 ONE WAM LIMITED,Financial Services,360ONE,EQ,INE466L01038
+3M India LIMITED,Diversified,3MINDIA,EQ,INE470A01017
+"""
+
+
+class FakeResponse:
+    def __init__(self, on_chunk=None, status_code=200):
+        self.status_code = status_code
+        self.on_chunk = on_chunk
+
+    def iter_content(self, chunk_size):
+        if self.on_chunk:
+            self.on_chunk()
+        yield b"report"
+
+
+class QueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.db_path = self.root / "work_queue.db"
+        self.csv_path = self.root / "companies.csv"
+        self.csv_path.write_text(CSV_ROWS, encoding='utf-8')
+        self.coordinator = LeaseCoordinator(self.db_path, lease_seconds=0.2, max_attempts=2, retry_delay=0)
+
+    def tearDown(self):
+        self.coordinator.close()
+        self.tmp.cleanup()
+
+
+class LeaseCoordinatorTest(QueueTestCase):
+    def test_lease_returns_leased_row(self):
+        self.coordinator.enqueue_companies(self.csv_path)
+        job = self.coordinator.lease("w1")
+
+        self.assertEqual(job['state'], 'leased')
+        self.assertEqual(job['worker_id'], 'w1')
+        self.assertEqual(job['attempts'], 1)
+        self.assertEqual(job['payload']['industry'], "Financial Services")
+
+    def test_downloads_leased_before_companies(self):
+        self.coordinator.enqueue_companies(self.csv_path)
+        self.coordinator.enqueue('download', "https://x/a.pdf", {'url': "https://x/a.pdf"})
+        self.assertEqual(self.coordinator.lease("w1")['kind'], 'download')
+
+    def test_ack_only_once_and_only_by_holder(self):
+        self.coordinator.enqueue('company', "A", {})
+        job = self.coordinator.lease("w1")
+
+        self.assertFalse(self.coordinator.ack(job['id'], "w2"))
+        self.assertTrue(self.coordinator.ack(job['id'], "w1"))
+        self.assertFalse(self.coordinator.ack(job['id'], "w1"))
+        self.assertEqual(self.coordinator.counts(), {'company': {'done': 1}})
+
+    def test_expired_lease_is_reclaimed(self):
+        self.coordinator.enqueue('company', "A", {})
+        job = self.coordinator.lease("crashed")
+        self.assertIsNone(self.coordinator.lease("w2"))
+
+        time.sleep(0.3)
+        retry = self.coordinator.lease("w2")
+        self.assertEqual(retry['id'], job['id'])
+        self.assertEqual(retry['attempts'], 2)
+        self.assertFalse(self.coordinator.heartbeat(job['id'], "crashed"))
+        self.assertFalse(self.coordinator.ack(job['id'], "crashed"))
+        self.assertTrue(self.coordinator.ack(job['id'], "w2"))
+
+    def test_heartbeat_keeps_lease(self):
+        self.coordinator.enqueue('company', "A", {})
+        job = self.coordinator.lease("w1")
+        for _ in range(3):
+            time.sleep(0.1)
+            self.assertTrue(self.coordinator.heartbeat(job['id'], "w1"))
+        self.assertIsNone(self.coordinator.lease("w2"))
+
+    def test_heartbeat_thread_notices_lost_lease(self):
+        self.coordinator.enqueue('company', "A", {})
+        job = self.coordinator.lease("w1")
+        with Heartbeat(self.db_path, job['id'], "w1", 0.3) as heartbeat:
+            self.coordinator.conn.execute("UPDATE jobs SET worker_id = 'w2' WHERE id = ?", (job['id'],))
+            time.sleep(0.35)
+        self.assertTrue(heartbeat.lost)
+
+    def test_max_attempts_fails_job(self):
+        self.coordinator.enqueue('company', "A", {})
+        job = self.coordinator.lease("w1")
+        self.assertTrue(self.coordinator.release(job['id'], "w1", "boom"))
+        job = self.coordinator.lease("w1")
+        self.assertTrue(self.coordinator.release(job['id'], "w1", "boom"))
+
+        self.assertIsNone(self.coordinator.lease("w1"))
+        self.assertEqual(self.coordinator.counts(), {'company': {'failed': 1}})
+
+    def test_released_job_waits_before_retry(self):
+        coordinator = LeaseCoordinator(self.db_path, max_attempts=3, retry_delay=0.2)
+        try:
+            coordinator.enqueue('download', "https://x/a.pdf", {})
+            job = coordinator.lease("w1")
+            coordinator.release(job['id'], "w1", "403")
+            self.assertIsNone(coordinator.lease("w1"))
+            self.assertTrue(coordinator.has_open_jobs())
+
+            time.sleep(0.25)
+            job = coordinator.lease("w1")
+            self.assertEqual(job['attempts'], 2)
+
+            # The second failure waits twice as long
+            coordinator.release(job['id'], "w1", "403")
+            not_before = coordinator.conn.execute("SELECT not_before FROM jobs").fetchone()[0]
+            self.assertAlmostEqual(not_before - time.time(), 0.4, delta=0.1)
+        finally:
+            coordinator.close()
+
+    def test_requeue_rearms_finished_companies(self):
+        self.assertEqual(self.coordinator.enqueue_companies(self.csv_path), 2)
+        for _ in range(2):
+            job = self.coordinator.lease("w1")
+            self.coordinator.ack(job['id'], "w1")
+
+        self.assertEqual(self.coordinator.enqueue_companies(self.csv_path), 0)
+        self.assertEqual(self.coordinator.enqueue_companies(self.csv_path, requeue=True), 2)
+        self.assertEqual(self.coordinator.lease("w1")['attempts'], 1)
+
+
+class LeaseWorkerTest(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cwd = os.getcwd()
+        os.chdir(self.root)
+        self.scraper = NSEReportsScraper()
+        self.worker = LeaseWorker(self.db_path, scraper=self.scraper, lease_seconds=5)
+
+    def tearDown(self):
+        self.worker.coordinator.close()
+        self.scraper.index.close()
+        os.chdir(self.cwd)
+        super().tearDown()
+
+    def test_empty_response_is_not_a_failure(self):
+        self.coordinator.enqueue_companies(self.csv_path, max_companies=1)
+        self.scraper.search_company_reports = lambda company_name, symbol: {}
+        job = self.worker.coordinator.lease(self.worker.worker_id)
+        self.assertEqual(self.worker.run_company_job(job), (True, None))
+
+    def test_downloads_are_indexed_with_csv_metadata(self):
+        self.coordinator.enqueue_companies(self.csv_path, max_companies=1)
+        url = "https://nsearchives.nseindia.com/annual_reports/AR_1_360ONE_2022_2023.pdf"
+        self.scraper.search_company_reports = lambda company_name, symbol: {'data': [{'file': url}]}
+        self.scraper.session.get = lambda *args, **kwargs: FakeResponse()
+
+        company_job = self.worker.coordinator.lease(self.worker.worker_id)
+        self.worker.run_company_job(company_job)
+        download_job = self.worker.coordinator.lease(self.worker.worker_id)
+        self.assertEqual(self.worker.run_download_job(download_job), (True, None))
+
+        rows = self.scraper.index.query(industry="Financial Services", fiscal_year=2023)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['isin'], "INE466L01038")
+
+    def test_lost_lease_discards_download(self):
+        url = "https://nsearchives.nseindia.com/annual_reports/AR_1_360ONE_2022_2023.pdf"
+        self.coordinator.enqueue('download', url, {'url': url, 'company_name': "360 ONE WAM LIMITED",
+                                                   'symbol': "360ONE"})
+        job = self.worker.coordinator.lease(self.worker.worker_id)
+
+        def steal_lease():
+            self.coordinator.conn.execute("UPDATE jobs SET worker_id = 'other' WHERE id = ?", (job['id'],))
+
+        self.scraper.session.get = lambda *args, **kwargs: FakeResponse(on_chunk=steal_lease)
+        self.assertEqual(self.worker.run_download_job(job), (False, "lease lost"))
+
+        company_dir = Path("downloaded_reports") / "360 ONE WAM LIMITED"
+        self.assertEqual(list(company_dir.iterdir()), [])
+        self.assertFalse(self.scraper.index.has_url(url))
+
+    def test_failed_download_refreshes_cookies_and_backs_off(self):
+        url = "https://nsearchives.nseindia.com/annual_reports/AR_1_360ONE_2022_2023.pdf"
+        self.coordinator.enqueue('download', url, {'url': url, 'company_name': "360 ONE WAM LIMITED",
+                                                   'symbol': "360ONE"})
+        cookie_calls = []
+        self.scraper.get_initial_cookies = lambda: cookie_calls.append(1) or True
+        self.scraper.session.get = lambda *args, **kwargs: FakeResponse(status_code=403)
+
+        job = self.worker.coordinator.lease(self.worker.worker_id)
+        self.assertEqual(self.worker.run_download_job(job), (False, "download failed"))
+        self.assertEqual(len(cookie_calls), 1)
+
+        self.assertTrue(self.worker.coordinator.release(job['id'], self.worker.worker_id, "download failed"))
+        self.assertIsNone(self.worker.coordinator.lease(self.worker.worker_id))
+        self.assertEqual(self.coordinator.counts(), {'download': {'pending': 1}})
+
+    def test_stale_partial_files_are_removed(self):
+        url = "https://nsearchives.nseindia.com/annual_reports/AR_1_360ONE_2022_2023.pdf"
+        self.coordinator.enqueue('company', "OTHER", {})
+        self.coordinator.lease("busy-host-1")
+        self.coordinator.conn.execute("UPDATE jobs SET lease_expires = ? WHERE key = 'OTHER'", (time.time() + 60,))
+        self.coordinator.enqueue('download', url, {'url': url, 'company_name': "360 ONE WAM LIMITED",
+                                                   'symbol': "360ONE"})
+
+        company_dir = Path("downloaded_reports") / "360 ONE WAM LIMITED"
+        company_dir.mkdir(parents=True)
+        stale = company_dir / "AR_1_360ONE_2022_2023.pdf.crashed-host.2.part"
+        live = company_dir / "AR_1_360ONE_2022_2023.pdf.busy-host-1.part"
+        stale.write_bytes(b"partial")
+        live.write_bytes(b"partial")
+
+        self.scraper.session.get = lambda *args, **kwargs: FakeResponse()
+        job = self.worker.coordinator.lease(self.worker.worker_id)
+        self.assertEqual(self.worker.run_download_job(job), (True, None))
+
+        self.assertFalse(stale.exists())
+        self.assertTrue(live.exists())
+        self.assertTrue((company_dir / "AR_1_360ONE_2022_2023.pdf").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
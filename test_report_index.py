@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the report index and the indexing done by the requests-based scraper
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from report_index import ReportIndex, guess_fiscal_year
+from scrape_annual_reports import NSEReportsScraper
+
+
+class FakeResponse:
+    def __init__(self, chunks, fail_after=None):
+        self.status_code = 200
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def iter_content(self, chunk_size):
+        for i, chunk in enumerate(self.chunks):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise ConnectionError("connection reset")
+            yield chunk
+
+
+class GuessFiscalYearTest(unittest.TestCase):
+    def test_two_year_name_takes_later_year(self):
+        url = "https://nsearchives.nseindia.com/annual_reports/AR_24562_RELIANCE_2022_2023_A_07082023214508.pdf"
+        self.assertEqual(guess_fiscal_year(url), 2023)
+
+    def test_single_year(self):
+        self.assertEqual(guess_fiscal_year("AR_12345_2023_report.pdf"), 2023)
+
+    def test_no_year(self):
+        self.assertIsNone(guess_fiscal_year("AR_12345_report.pdf"))
+
+
+class ReportIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.index = ReportIndex(self.root / "downloaded_reports" / "reports_index.db")
+        self.index.record_report(self.root / "downloaded_reports" / "A" / "AR_1_2022_2023.pdf", "AAA",
+                                 "https://x/AR_1_2022_2023.pdf", 10, "aa",
+                                 isin="INE000A01010", industry="Financial Services")
+        self.index.record_report(self.root / "downloaded_reports" / "A" / "AR_2_2023_2024.pdf", "AAA",
+                                 "https://x/AR_2_2023_2024.pdf", 20, "bb",
+                                 isin="INE000A01010", industry="Financial Services")
+        self.index.record_report(self.root / "downloaded_reports" / "B" / "AR_3_2022_2023.pdf", "BBB",
+                                 "https://x/AR_3_2022_2023.pdf", 30, "cc",
+                                 isin="INE000B01010", industry="Information Technology")
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_query_by_industry_and_year(self):
+        rows = self.index.query(industry="financial services", fiscal_year=2023)
+        self.assertEqual([row['filename'] for row in rows], ["AR_1_2022_2023.pdf"])
+
+    def test_industry_query_uses_index(self):
+        plan = self.index.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM reports WHERE industry = ? AND fiscal_year = ?",
+            ("financial services", 2023)).fetchall()
+        self.assertIn("idx_reports_industry_fy", " ".join(row['detail'] for row in plan))
+
+    def test_path_is_independent_of_working_directory(self):
+        path = self.root / "downloaded_reports" / "B" / "AR_3_2022_2023.pdf"
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.root / "downloaded_reports")
+            self.assertTrue(self.index.has_path(Path("B") / "AR_3_2022_2023.pdf"))
+            os.chdir(self.root)
+            self.assertTrue(self.index.has_path(Path("downloaded_reports") / "B" / "AR_3_2022_2023.pdf"))
+        finally:
+            os.chdir(cwd)
+        self.assertTrue(self.index.has_path(path))
+        self.assertEqual(self.index.query(symbol="BBB")[0]['path'], "B/AR_3_2022_2023.pdf")
+
+    def test_export_csv(self):
+        output = self.root / "out.csv"
+        self.assertEqual(self.index.export_csv(output, self.index.query(symbol="AAA")), 2)
+        with open(output, encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row['fiscal_year'] for row in rows], ["2023", "2024"])
+
+    def test_export_jsonl(self):
+        output = self.root / "out.jsonl"
+        self.assertEqual(self.index.export_jsonl(output), 3)
+        with open(output, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual({row['symbol'] for row in rows}, {"AAA", "BBB"})
+
+
+class ScraperIndexingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.scraper = NSEReportsScraper()
+        self.scraper.company_metadata = {
+            '360ONE': {'company_name': '360 ONE WAM LIMITED', 'isin': 'INE466L01038',
+                       'industry': 'Financial Services'},
+        }
+        self.url = "https://nsearchives.nseindia.com/annual_reports/AR_1_360ONE_2022_2023.pdf"
+
+    def tearDown(self):
+        self.scraper.index.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_completed_download_is_indexed(self):
+        self.scraper.session.get = lambda *args, **kwargs: FakeResponse([b"hello", b"world"])
+        self.assertTrue(self.scraper.download_file(self.url, "360 ONE WAM LIMITED", symbol="360ONE"))
+
+        rows = self.scraper.index.query(industry="Financial Services", fiscal_year=2023)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['isin'], "INE466L01038")
+        self.assertEqual(rows[0]['size'], 10)
+
+    def test_backfilled_file_keeps_its_modification_time(self):
+        file_path = Path("downloaded_reports") / "360 ONE WAM LIMITED" / "AR_1_360ONE_2022_2023.pdf"
+        file_path.parent.mkdir(parents=True)
+        file_path.write_bytes(b"old report")
+        os.utime(file_path, (1600000000, 1600000000))
+
+        self.assertTrue(self.scraper.download_file(self.url, "360 ONE WAM LIMITED", symbol="360ONE"))
+        self.assertEqual(self.scraper.index.query()[0]['downloaded_at'], 1600000000)
+
+    def test_interrupted_download_leaves_no_files(self):
+        self.scraper.session.get = lambda *args, **kwargs: FakeResponse([b"hello", b"world"], fail_after=1)
+        self.assertFalse(self.scraper.download_file(self.url, "360 ONE WAM LIMITED", symbol="360ONE"))
+
+        company_dir = Path("downloaded_reports") / "360 ONE WAM LIMITED"
+        self.assertEqual(list(company_dir.iterdir()), [])
+        self.assertEqual(self.scraper.index.query(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
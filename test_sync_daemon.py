@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the sync daemon's polling schedule
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from report_index import ReportIndex
+from sync_daemon import DAY, HOUR, SyncDaemon
+
+
+class StubScraper:
+    """Returns a fixed list of links and indexes every download that is allowed to succeed"""
+
+    def __init__(self, index):
+        self.index = index
+        self.links = []
+        self.failing = set()
+        self.api_down = False
+
+    def get_initial_cookies(self):
+        return True
+
+    def search_company_reports(self, company_name, symbol):
+        return None if self.api_down else {'links': list(self.links)}
+
+    def extract_download_links_from_response(self, data):
+        return data['links']
+
+    def download_file(self, url, company_name, symbol=None):
+        if url in self.failing:
+            return False
+        self.index.record_report(Path(self.index.db_path.parent) / Path(url).name, symbol, url, 1, "00")
+        return True
+
+
+def state(interval=None, failures=0, filing_months=''):
+    return {'interval': interval, 'failures': failures, 'filing_months': filing_months}
+
+
+class NextIntervalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = ReportIndex(Path(self.tmp.name) / "reports_index.db")
+        self.daemon = SyncDaemon(scraper=StubScraper(self.index))
+        self.june = datetime(2026, 6, 10).timestamp()
+        self.august = datetime(2026, 8, 10).timestamp()
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_changed_polls_soon(self):
+        self.assertEqual(self.daemon.next_interval(state(), True, False, self.june), 6 * HOUR)
+
+    def test_download_retries_back_off(self):
+        self.assertEqual(self.daemon.retry_interval(0), 6 * HOUR)
+        self.assertEqual(self.daemon.retry_interval(3), 48 * HOUR)
+        self.assertEqual(self.daemon.retry_interval(20), 30 * DAY)
+
+    def test_failures_back_off(self):
+        self.assertEqual(self.daemon.next_interval(state(failures=2), False, True, self.june), 24 * HOUR)
+        self.assertEqual(self.daemon.next_interval(state(failures=20), False, True, self.june), 30 * DAY)
+
+    def test_filing_window_polls_daily(self):
+        self.assertEqual(self.daemon.next_interval(state(), False, False, self.august), DAY)
+
+    def test_learned_window_replaces_default(self):
+        self.assertEqual(self.daemon.next_interval(state(filing_months='6'), False, False, self.june), DAY)
+        self.assertEqual(self.daemon.next_interval(state(filing_months='6'), False, False, self.august), 7 * DAY)
+
+    def test_dormant_doubles_up_to_max(self):
+        self.assertEqual(self.daemon.next_interval(state(), False, False, self.june), 7 * DAY)
+        self.assertEqual(self.daemon.next_interval(state(interval=7 * DAY), False, False, self.june), 14 * DAY)
+        self.assertEqual(self.daemon.next_interval(state(interval=30 * DAY), False, False, self.june), 30 * DAY)
+
+    def test_poll_time_capped_at_window_start(self):
+        now = datetime(2026, 6, 25).timestamp()
+        next_poll = self.daemon.next_poll_time(state(interval=30 * DAY), 30 * DAY, now)
+        self.assertEqual(next_poll, datetime(2026, 7, 1).timestamp())
+
+    def test_window_start_wraps_year(self):
+        now = datetime(2026, 11, 5).timestamp()
+        self.assertEqual(self.daemon.next_window_start(state(filing_months='2'), now),
+                         datetime(2027, 2, 1).timestamp())
+
+
+@mock.patch('sync_daemon.time.sleep')
+class PollCompanyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = ReportIndex(Path(self.tmp.name) / "reports_index.db")
+        self.scraper = StubScraper(self.index)
+        self.daemon = SyncDaemon(scraper=self.scraper)
+        self.daemon.add_companies([("3M India LIMITED", "3MINDIA")])
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def row(self):
+        return self.daemon.conn.execute("SELECT * FROM poll_state WHERE symbol = '3MINDIA'").fetchone()
+
+    def test_first_poll_is_baseline(self, sleep):
+        self.scraper.links = ["https://x/AR_1_2023.pdf"]
+        self.daemon.poll_company("3MINDIA")
+        self.assertIsNone(self.row()['last_changed'])
+        self.assertEqual(self.row()['filing_months'], '')
+
+    def test_change_learns_filing_month(self, sleep):
+        self.scraper.links = ["https://x/AR_1_2023.pdf"]
+        self.daemon.poll_company("3MINDIA")
+        self.scraper.links.append("https://x/AR_2_2024.pdf")
+        _, downloaded = self.daemon.poll_company("3MINDIA")
+
+        self.assertEqual(downloaded, 1)
+        self.assertEqual(self.row()['filing_months'], str(datetime.now().month))
+        self.assertEqual(self.row()['interval'], self.daemon.min_interval)
+
+    def test_failed_download_is_retried_soon(self, sleep):
+        self.scraper.links = ["https://x/AR_1_2023.pdf"]
+        self.daemon.poll_company("3MINDIA")
+        self.scraper.links.append("https://x/AR_2_2024.pdf")
+        self.scraper.failing.add("https://x/AR_2_2024.pdf")
+        next_poll, _ = self.daemon.poll_company("3MINDIA")
+        self.assertLessEqual(next_poll - self.row()['last_polled'], 1.1 * self.daemon.min_interval)
+        self.assertEqual(self.row()['retries'], 1)
+
+        self.scraper.failing.clear()
+        _, downloaded = self.daemon.poll_company("3MINDIA")
+        self.assertEqual(downloaded, 1)
+        self.assertEqual(self.row()['retries'], 0)
+
+    def test_dead_link_backs_off_and_new_links_are_still_detected(self, sleep):
+        self.scraper.links = ["https://x/AR_1_2023.pdf", "https://x/AR_dead.pdf"]
+        self.scraper.failing.add("https://x/AR_dead.pdf")
+        self.daemon.poll_company("3MINDIA")
+
+        waits = []
+        for _ in range(5):
+            next_poll, _ = self.daemon.poll_company("3MINDIA")
+            waits.append(next_poll - self.row()['last_polled'])
+        self.assertEqual(self.row()['retries'], 6)
+        self.assertIsNone(self.row()['last_changed'])
+        self.assertGreater(waits[-1], 1.1 * self.daemon.min_interval)
+
+        # A new report is picked up while the dead link keeps failing
+        self.scraper.links.append("https://x/AR_2_2024.pdf")
+        _, downloaded = self.daemon.poll_company("3MINDIA")
+        self.assertEqual(downloaded, 1)
+        self.assertIsNotNone(self.row()['last_changed'])
+        self.assertEqual(self.row()['filing_months'], str(datetime.now().month))
+
+    def test_empty_response_is_not_a_change(self, sleep):
+        self.scraper.links = ["https://x/AR_1_2023.pdf"]
+        self.daemon.poll_company("3MINDIA")
+        digest = self.row()['links_digest']
+
+        self.scraper.links = []
+        self.daemon.poll_company("3MINDIA")
+        self.assertEqual(self.row()['links_digest'], digest)
+        self.assertIsNone(self.row()['last_changed'])
+        self.assertEqual(self.row()['filing_months'], '')
+
+        self.scraper.links = ["https://x/AR_1_2023.pdf"]
+        self.daemon.poll_company("3MINDIA")
+        self.assertIsNone(self.row()['last_changed'])
+
+    def test_api_failure_keeps_learned_interval(self, sleep):
+        self.scraper.links = ["https://x/AR_1_2023.pdf"]
+        self.daemon.poll_company("3MINDIA")
+        interval = self.row()['interval']
+        self.scraper.api_down = True
+        self.daemon.poll_company("3MINDIA")
+        self.assertEqual(self.row()['interval'], interval)
+        self.assertEqual(self.row()['failures'], 1)
+
+    def test_schedule_only_has_current_companies(self, sleep):
+        self.daemon.add_companies([("Removed LIMITED", "GONE")])
+        schedule = self.daemon.load_schedule([("3M India LIMITED", "3MINDIA")])
+        self.assertEqual([symbol for _, symbol in schedule], ["3MINDIA"])
+
+
+if __name__ == "__main__":
+    unittest.main()